@@ -16,8 +16,9 @@ def create_app():
     with app.app_context():
         # Import Models để SQLAlchemy tạo bảng
         from app.models.user import User, Department
-        from app.models.attendance import Attendance
+        from app.models.attendance import Attendance, AttendanceArchive, ArchivedPeriod
         from app.models.schedule import Shift, EmployeeSchedule
+        from app.models.job import Job
 
         # Import Controllers (Blueprints)
         from app.controllers.auth import auth_bp
@@ -32,4 +33,15 @@ def create_app():
         # Tạo bảng
         db.create_all()
 
+        # Tác vụ nền (worker pool được tạo khi có tác vụ đầu tiên)
+        from app.services.job_service import JobService
+        JobService.init_app(app)
+
+    @app.cli.command('archive-attendance')
+    def archive_attendance():
+        """Lưu trữ các tháng chấm công đã chốt (chạy định kỳ bằng cron)."""
+        from app.services.archive_service import ArchiveService
+        for year, month in ArchiveService.archive_closed_months():
+            print(f'Đã lưu trữ tháng {month:02d}/{year}')
+
     return app
\ No newline at end of file
@@ -1,14 +1,16 @@
 # File: app/controllers/admin.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, session, current_app, jsonify, abort
 from datetime import date, timedelta, datetime
-import pandas as pd
-import io
+import os
 
 from app.extensions import db
 from app.utils import admin_required, login_required
 from app.models.user import User, Department
 from app.models.schedule import Shift, EmployeeSchedule
-from app.models.attendance import Attendance
+from app.models.attendance import Attendance, ArchivedPeriod
+from app.models.job import Job
+from app.services.archive_service import ArchiveService
+from app.services.job_service import JobService, JOB_HANDLERS
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -148,38 +150,115 @@ def process_approval(id, action):
     return redirect(url_for('admin.admin_approvals'))
 
 
-@admin_bp.route('/admin/export_excel')
+@admin_bp.route('/admin/archive')
 @admin_required
-def export_excel():
-    # Lấy dữ liệu chấm công
-    attendances = Attendance.query.order_by(Attendance.work_date.desc()).all()
-    
-    # Tạo list dữ liệu
-    data = []
-    for att in attendances:
-        user = User.query.get(att.user_id)
-        data.append({
-            'Mã NV': att.user_id,
-            'Họ Tên': user.full_name if user else 'Unknown',
-            'Ngày': att.work_date,
-            'Vào': att.check_in_time.strftime('%H:%M') if att.check_in_time else '',
-            'Ra': att.check_out_time.strftime('%H:%M') if att.check_out_time else '',
-            'Trạng thái': att.status,
-            'Duyệt': att.approval_status
-        })
-    
-    # Chuyển sang DataFrame
-    df = pd.DataFrame(data)
-    
-    # Ghi vào file Excel trong bộ nhớ (không lưu ra ổ cứng)
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='ChamCong')
-    
-    output.seek(0)
-    # Trả file Excel cho client
-    return send_file(output, download_name="bao_cao_cham_cong.xlsx", as_attachment=True,
-                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+def admin_archive():
+    hot_months = ArchiveService.hot_months()
+    for m in hot_months:
+        m['closed'] = ArchiveService.is_closed(m['year'], m['month'], m['pending'])
+    archived = ArchivedPeriod.query.order_by(ArchivedPeriod.year.desc(), ArchivedPeriod.month.desc()).all()
+    return render_template('admin/archive.html', hot_months=hot_months, archived=archived,
+                           keep_months=current_app.config.get('ARCHIVE_KEEP_MONTHS', 3))
+
+
+@admin_bp.route('/admin/archive/<int:year>/<int:month>/<action>', methods=['POST'], endpoint='process_archive')
+@admin_required
+def process_archive(year, month, action):
+    if not 1 <= month <= 12:
+        flash('Tháng không hợp lệ.', 'danger')
+        return redirect(url_for('admin.admin_archive'))
+
+    try:
+        if action == 'archive':
+            count = ArchiveService.archive_month(year, month)
+            flash(f'Đã lưu trữ {count} bản ghi của tháng {month:02d}/{year}.', 'success')
+        elif action == 'restore':
+            count = ArchiveService.restore_month(year, month)
+            flash(f'Đã khôi phục {count} bản ghi của tháng {month:02d}/{year}.', 'success')
+        else:
+            flash('Hành động không hợp lệ.', 'danger')
+    except ValueError as e:
+        flash(str(e), 'warning')
+    except Exception as e:
+        flash(f'Lỗi khi xử lý: {str(e)}', 'danger')
+
+    return redirect(url_for('admin.admin_archive'))
+
+
+def _job_status(job):
+    return {
+        'job_id': job.job_id,
+        'status': job.status,
+        'progress': job.progress or 0,
+        'message': job.message,
+        'download_url': url_for('admin.download_job', job_id=job.job_id) if job.status == 'Done' and job.result_file else None
+    }
+
+
+@admin_bp.route('/admin/jobs')
+@admin_required
+def admin_jobs():
+    JobService.purge_expired()
+    jobs = Job.query.order_by(Job.created_at.desc()).limit(50).all()
+    return render_template('admin/jobs.html', jobs=jobs, handlers=JOB_HANDLERS, today_date=date.today())
+
+
+@admin_bp.route('/admin/jobs/<job_type>', methods=['POST'])
+@admin_required
+def enqueue_job(job_type):
+    params = {}
+    try:
+        if job_type == 'export_attendance':
+            # Khoảng ngày (YYYY-MM-DD), bỏ trống = xuất toàn bộ
+            for key in ('start', 'end'):
+                if request.form.get(key):
+                    params[key] = date.fromisoformat(request.form[key]).isoformat()
+        elif job_type == 'generate_roster':
+            # input type="month" gửi lên dạng YYYY-MM
+            year, month = request.form.get('month', '').split('-')
+            params = {'year': int(year), 'month': int(month)}
+            if not 1 <= params['month'] <= 12:
+                raise ValueError('tháng phải từ 1 đến 12')
+
+        JobService.enqueue(job_type, params, session.get('user_id'))
+        flash(f'Đã đưa vào hàng đợi: {JOB_HANDLERS[job_type]["title"]}', 'success')
+    except ValueError as e:
+        flash(f'Dữ liệu không hợp lệ: {str(e)}', 'warning')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Lỗi khi tạo tác vụ: {str(e)}', 'danger')
+
+    return redirect(url_for('admin.admin_jobs'))
+
+
+@admin_bp.route('/admin/jobs/<job_id>/status')
+@admin_required
+def job_status(job_id):
+    job = Job.query.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'Không tìm thấy tác vụ'}), 404
+    return jsonify(dict(success=True, **_job_status(job)))
+
+
+@admin_bp.route('/admin/jobs/<job_id>/cancel', methods=['POST'])
+@admin_required
+def cancel_job(job_id):
+    job = Job.query.get_or_404(job_id)
+    if JobService.cancel(job):
+        flash('Đã yêu cầu hủy tác vụ.', 'warning')
+    else:
+        flash('Tác vụ đã kết thúc, không thể hủy.', 'info')
+    return redirect(url_for('admin.admin_jobs'))
+
+
+@admin_bp.route('/admin/jobs/<job_id>/download')
+@admin_required
+def download_job(job_id):
+    job = Job.query.get_or_404(job_id)
+    path = os.path.join(JobService.result_dir(), job.result_file) if job.result_file else None
+    if job.status != 'Done' or not path or not os.path.exists(path):
+        abort(404)
+    return send_file(path, download_name=job.download_name, as_attachment=True)
 
 
 @admin_bp.route('/users/delete/<int:user_id>', methods=['POST'])
@@ -15,6 +15,7 @@ from app.utils import login_required
 from app.models.user import User
 from app.models.attendance import Attendance
 from app.services.time_service import TimekeepingService
+from app.services.archive_service import ArchiveService
 
 home_bp = Blueprint('home', __name__)
 
@@ -38,9 +39,8 @@ def dashboard():
 
     att_today = Attendance.query.filter_by(user_id=user.user_id, work_date=today).first()
     
-    query = Attendance.query
-    if user.role != 'admin': query = query.filter_by(user_id=user.user_id)
-    history = query.order_by(Attendance.work_date.desc(), Attendance.id.desc()).limit(50).all()
+    # Đọc gộp bảng chấm công hiện tại và dữ liệu đã lưu trữ
+    history = ArchiveService.history(user_id=None if user.role == 'admin' else user.user_id, limit=50)
 
     # Xử lý data hiển thị (giữ nguyên logic cũ)
     data = []
@@ -5,7 +5,7 @@ class Attendance(db.Model):
     __tablename__ = 'attendance'
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
-    work_date = db.Column(db.Date, nullable=False)
+    work_date = db.Column(db.Date, nullable=False, index=True)
     check_in_time = db.Column(db.DateTime)
     check_out_time = db.Column(db.DateTime)
     status = db.Column(db.String(50))
@@ -13,4 +13,30 @@ class Attendance(db.Model):
     overtime_minutes = db.Column(db.Integer, default=0)
     approval_status = db.Column(db.String(20), default='Pending')
     manager_comment = db.Column(db.Text)
-    user = db.relationship('User', backref='attendances')
\ No newline at end of file
+    user = db.relationship('User', backref='attendances')
+
+# Bảng lưu trữ (cold): các tháng đã chốt được chuyển khỏi bảng attendance
+class AttendanceArchive(db.Model):
+    __tablename__ = 'attendance_archive'
+    archive_id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.Integer, nullable=False)  # id gốc bên bảng attendance
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    work_date = db.Column(db.Date, nullable=False, index=True)
+    check_in_time = db.Column(db.DateTime)
+    check_out_time = db.Column(db.DateTime)
+    status = db.Column(db.String(50))
+    notes = db.Column(db.Text)
+    overtime_minutes = db.Column(db.Integer, default=0)
+    approval_status = db.Column(db.String(20), default='Pending')
+    manager_comment = db.Column(db.Text)
+    archived_at = db.Column(db.DateTime, server_default=db.func.now())
+    user = db.relationship('User', backref='archived_attendances')
+
+class ArchivedPeriod(db.Model):
+    __tablename__ = 'archived_periods'
+    __table_args__ = (db.UniqueConstraint('year', 'month'),)
+    period_id = db.Column(db.Integer, primary_key=True)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    record_count = db.Column(db.Integer, default=0)
+    archived_at = db.Column(db.DateTime, server_default=db.func.now())
@@ -0,0 +1,22 @@
+# File: app/models/job.py
+from datetime import datetime
+from app.extensions import db
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    job_id = db.Column(db.String(32), primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)
+    params = db.Column(db.Text)  # JSON tham số đầu vào
+    status = db.Column(db.String(20), default='Pending', index=True)  # Pending / Running / Done / Failed / Cancelled
+    progress = db.Column(db.Integer, default=0)  # 0 - 100
+    message = db.Column(db.Text)
+    cancel_requested = db.Column(db.Boolean, default=False)
+    result_file = db.Column(db.String(255))  # Tên file kết quả trong instance/jobs
+    download_name = db.Column(db.String(255))
+    created_by = db.Column(db.Integer, db.ForeignKey('users.user_id'))
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.now)  # Nhịp tim của worker đang xử lý
+    expires_at = db.Column(db.DateTime)
+    user = db.relationship('User')
@@ -0,0 +1,148 @@
+# File: app/services/archive_service.py
+from datetime import date
+from flask import current_app
+from sqlalchemy import case, extract, func, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models.attendance import Attendance, AttendanceArchive, ArchivedPeriod
+
+# Các cột được chuyển qua lại giữa bảng nóng (attendance) và bảng lưu trữ
+DATA_COLUMNS = ['user_id', 'work_date', 'check_in_time', 'check_out_time', 'status',
+                'notes', 'overtime_minutes', 'approval_status', 'manager_comment']
+
+
+class ArchiveService:
+    @staticmethod
+    def month_range(year, month):
+        # Trả về [ngày đầu tháng, ngày đầu tháng sau)
+        start = date(year, month, 1)
+        end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+        return start, end
+
+    @staticmethod
+    def hot_months():
+        # Thống kê các tháng còn trong bảng attendance: (năm, tháng, số bản ghi, số chờ duyệt)
+        year_col = extract('year', Attendance.work_date)
+        month_col = extract('month', Attendance.work_date)
+        pending = func.sum(case((Attendance.approval_status == 'Pending', 1), else_=0))
+        rows = db.session.query(year_col, month_col, func.count(Attendance.id), pending) \
+            .group_by(year_col, month_col).order_by(year_col.desc(), month_col.desc()).all()
+        return [{'year': int(y), 'month': int(m), 'total': total, 'pending': int(p or 0)}
+                for y, m, total, p in rows]
+
+    @staticmethod
+    def is_closed(year, month, pending=None):
+        # Tháng đã chốt = đã qua hết tháng và không còn bản ghi chờ duyệt
+        start, end = ArchiveService.month_range(year, month)
+        if end > date.today().replace(day=1):
+            return False
+        if pending is None:
+            pending = Attendance.query.filter(Attendance.work_date >= start, Attendance.work_date < end,
+                                              Attendance.approval_status == 'Pending').count()
+        return pending == 0
+
+    @staticmethod
+    def archive_month(year, month):
+        """Chuyển toàn bộ chấm công của một tháng đã chốt sang bảng lưu trữ."""
+        if ArchivedPeriod.query.filter_by(year=year, month=month).first():
+            raise ValueError(f'Tháng {month:02d}/{year} đã được lưu trữ.')
+        if not ArchiveService.is_closed(year, month):
+            raise ValueError(f'Tháng {month:02d}/{year} chưa chốt hoặc còn bản ghi chờ duyệt.')
+
+        start, end = ArchiveService.month_range(year, month)
+        in_month = (Attendance.work_date >= start, Attendance.work_date < end)
+        try:
+            # INSERT ... SELECT để không phải nạp từng bản ghi lên Python
+            src = select(Attendance.id, *[getattr(Attendance, c) for c in DATA_COLUMNS]).where(*in_month)
+            moved = db.session.execute(
+                insert(AttendanceArchive).from_select(['id'] + DATA_COLUMNS, src)).rowcount
+            Attendance.query.filter(*in_month).delete(synchronize_session=False)
+            db.session.add(ArchivedPeriod(year=year, month=month, record_count=moved))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return moved
+
+    @staticmethod
+    def restore_month(year, month):
+        """Đưa một tháng đã lưu trữ trở lại bảng attendance."""
+        period = ArchivedPeriod.query.filter_by(year=year, month=month).first()
+        if not period:
+            raise ValueError(f'Tháng {month:02d}/{year} chưa được lưu trữ.')
+
+        start, end = ArchiveService.month_range(year, month)
+        in_month = (AttendanceArchive.work_date >= start, AttendanceArchive.work_date < end)
+
+        # Id tự tăng có thể bị cấp lại (SQLite không AUTOINCREMENT, MySQL < 8.0 sau khi khởi động lại
+        # khi bảng nóng từng bị lưu trữ hết), nên kiểm tra trùng trước khi chép id gốc về
+        clashes = db.session.query(func.count(AttendanceArchive.archive_id)) \
+            .join(Attendance, Attendance.id == AttendanceArchive.id).filter(*in_month).scalar()
+        if clashes:
+            raise ValueError(f'Không thể khôi phục tháng {month:02d}/{year}: {clashes} bản ghi trùng id '
+                             f'với dữ liệu chấm công hiện tại.')
+
+        try:
+            # Giữ nguyên id gốc để khôi phục không làm đổi số hiệu bản ghi
+            src = select(AttendanceArchive.id, *[getattr(AttendanceArchive, c) for c in DATA_COLUMNS]).where(*in_month)
+            restored = db.session.execute(
+                insert(Attendance).from_select(['id'] + DATA_COLUMNS, src)).rowcount
+            AttendanceArchive.query.filter(*in_month).delete(synchronize_session=False)
+            db.session.delete(period)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return restored
+
+    @staticmethod
+    def archive_closed_months(keep_months=None, on_progress=None):
+        """Lưu trữ mọi tháng đã chốt cũ hơn `keep_months` tháng gần nhất.
+
+        Gọi định kỳ (trang quản trị hoặc `flask archive-attendance`) để bảng nóng
+        chỉ giữ vài tháng dữ liệu, bất kể lịch sử dài bao nhiêu năm.
+        `on_progress(đã xử lý, tổng số)` được gọi sau mỗi tháng.
+        """
+        if keep_months is None:
+            keep_months = current_app.config.get('ARCHIVE_KEEP_MONTHS', 3)
+        today = date.today()
+        # Tháng mốc: mọi tháng trước mốc này đều được lưu trữ
+        idx = today.year * 12 + (today.month - 1) - keep_months
+        cutoff = (idx // 12, idx % 12 + 1)
+
+        candidates = [m for m in ArchiveService.hot_months()
+                      if (m['year'], m['month']) < cutoff
+                      and ArchiveService.is_closed(m['year'], m['month'], m['pending'])]
+        archived = []
+        for i, m in enumerate(candidates, 1):
+            # Tháng có thể vừa được lưu trữ bởi tác vụ khác / thao tác tay: bỏ qua, không dừng cả lượt
+            if not ArchivedPeriod.query.filter_by(year=m['year'], month=m['month']).first():
+                try:
+                    ArchiveService.archive_month(m['year'], m['month'])
+                    archived.append((m['year'], m['month']))
+                except IntegrityError:
+                    # Hai bên cùng lưu trữ một tháng: bên thua bị rollback nhờ ràng buộc (year, month)
+                    pass
+            if on_progress: on_progress(i, len(candidates))
+        return archived
+
+    @staticmethod
+    def history(user_id=None, start=None, end=None, limit=None):
+        """Đọc lịch sử chấm công gộp cả bảng nóng lẫn bảng lưu trữ.
+
+        Kết quả là danh sách bản ghi Attendance / AttendanceArchive (cùng tên cột),
+        sắp xếp theo ngày giảm dần. `end` là ngày cuối (bao gồm).
+        """
+        results = []
+        for model in (Attendance, AttendanceArchive):
+            query = model.query
+            if user_id is not None: query = query.filter(model.user_id == user_id)
+            if start is not None: query = query.filter(model.work_date >= start)
+            if end is not None: query = query.filter(model.work_date <= end)
+            query = query.order_by(model.work_date.desc(), model.id.desc())
+            if limit is not None: query = query.limit(limit)
+            results.extend(query.all())
+
+        results.sort(key=lambda r: (r.work_date, r.id), reverse=True)
+        return results[:limit] if limit is not None else results
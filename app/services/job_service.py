@@ -0,0 +1,330 @@
+# File: app/services/job_service.py
+import glob
+import json
+import os
+import threading
+import uuid
+from calendar import monthrange
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.extensions import db
+from app.models.job import Job
+from app.models.user import User
+from app.models.attendance import Attendance, AttendanceArchive
+from app.models.schedule import EmployeeSchedule
+from app.services.archive_service import ArchiveService
+from app.services.report_service import ReportService
+
+# Các trạng thái đã kết thúc (không còn chạy nữa)
+FINISHED_STATUSES = ('Done', 'Failed', 'Cancelled')
+
+# job_type -> hàm xử lý, đăng ký bằng @job_handler
+JOB_HANDLERS = {}
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def job_handler(job_type, title):
+    def decorator(f):
+        JOB_HANDLERS[job_type] = {'func': f, 'title': title}
+        return f
+    return decorator
+
+
+class JobContext:
+    """Được truyền vào hàm xử lý để báo tiến độ, kiểm tra hủy và ghi file kết quả.
+
+    `update` commit cả session, nên hàm xử lý không được để sẵn thay đổi dở dang
+    trong session nếu muốn hủy / lỗi thì không ghi gì.
+    """
+
+    def __init__(self, job):
+        self.job_id = job.job_id
+        self.result_file = None
+        self.download_name = None
+
+    def update(self, progress=None, message=None):
+        # Ghi tiến độ + nhịp tim, rồi dừng ngay nếu admin đã hủy hoặc tác vụ bị coi là gián đoạn
+        values = {'updated_at': datetime.now()}
+        if progress is not None:
+            values['progress'] = max(0, min(99, int(progress)))
+        if message: values['message'] = message
+        Job.query.filter_by(job_id=self.job_id, status='Running').update(values, synchronize_session=False)
+        # Commit kết thúc transaction, nên câu truy vấn dưới đây đọc được trạng thái mới nhất
+        db.session.commit()
+        status, cancel = db.session.query(Job.status, Job.cancel_requested).filter_by(job_id=self.job_id).one()
+        if status != 'Running':
+            raise JobCancelled('Bị gián đoạn (tiến trình xử lý đã dừng)')
+        if cancel:
+            raise JobCancelled()
+
+    @contextmanager
+    def keep_alive(self):
+        """Gửi nhịp tim định kỳ trong lúc chạy một bước dài không gọi được `update`."""
+        engine = db.engine
+        interval = max(1, current_app.config['JOB_HEARTBEAT_TIMEOUT_MINUTES'] * 60 // 3)
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(interval):
+                try:
+                    with engine.begin() as conn:
+                        conn.execute(update(Job).where(Job.job_id == self.job_id, Job.status == 'Running')
+                                     .values(updated_at=datetime.now()))
+                except SQLAlchemyError:
+                    # Lỡ một nhịp (vd. SQLite đang khóa ghi) thì thử lại ở nhịp sau
+                    pass
+
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def result_path(self, extension, download_name):
+        # Đường dẫn file kết quả trong instance/jobs (luôn đặt tên theo job_id)
+        self.result_file = f'{self.job_id}.{extension}'
+        self.download_name = download_name
+        return os.path.join(JobService.result_dir(), self.result_file)
+
+
+class JobService:
+    _executor_lock = threading.Lock()
+
+    @staticmethod
+    def init_app(app):
+        app.config.setdefault('JOB_MAX_WORKERS', 2)
+        app.config.setdefault('JOB_RESULT_TTL_HOURS', 24)
+        app.config.setdefault('JOB_HEARTBEAT_TIMEOUT_MINUTES', 10)
+        os.makedirs(os.path.join(app.instance_path, 'jobs'), exist_ok=True)
+
+        # Dọn tác vụ bị bỏ dở (reload, restart worker...) ở request đầu tiên, không phải lúc
+        # create_app(): lệnh CLI và tiến trình cha của reloader không phục vụ request nào
+        state = {'recovered': False}
+
+        @app.before_request
+        def recover_jobs_once():
+            if not state['recovered']:
+                state['recovered'] = True
+                JobService.recover_stale()
+
+    @staticmethod
+    def result_dir():
+        return os.path.join(current_app.instance_path, 'jobs')
+
+    @staticmethod
+    def remove_results(job_id):
+        # Xóa mọi file kết quả của tác vụ, kể cả file ghi dở chưa kịp lưu vào DB
+        for path in glob.glob(os.path.join(JobService.result_dir(), f'{job_id}.*')):
+            os.remove(path)
+
+    @staticmethod
+    def _submit(job_id):
+        app = current_app._get_current_object()
+        # Chỉ tạo worker pool khi thật sự có tác vụ; giới hạn số tác vụ chạy song song
+        with JobService._executor_lock:
+            if 'job_executor' not in app.extensions:
+                app.extensions['job_executor'] = ThreadPoolExecutor(
+                    max_workers=app.config['JOB_MAX_WORKERS'], thread_name_prefix='job')
+        app.extensions['job_executor'].submit(JobService._run, app, job_id)
+
+    @staticmethod
+    def enqueue(job_type, params=None, user_id=None):
+        if job_type not in JOB_HANDLERS:
+            raise ValueError(f'Loại tác vụ không hợp lệ: {job_type}')
+        JobService.purge_expired()
+
+        job = Job(job_id=uuid.uuid4().hex, job_type=job_type, params=json.dumps(params or {}),
+                  status='Pending', progress=0, created_by=user_id, message='Đang chờ xử lý')
+        db.session.add(job)
+        db.session.commit()
+
+        JobService._submit(job.job_id)
+        return job
+
+    @staticmethod
+    def cancel(job):
+        if job.status in FINISHED_STATUSES:
+            return False
+        # Chưa chạy thì hủy luôn (worker sẽ không nhận được); đang chạy thì worker tự dừng ở lần update tới
+        cancelled = Job.query.filter_by(job_id=job.job_id, status='Pending').update(
+            dict(JobService._finish_values('Cancelled', 'Đã hủy'), cancel_requested=True),
+            synchronize_session=False)
+        if not cancelled:
+            Job.query.filter_by(job_id=job.job_id).update({'cancel_requested': True}, synchronize_session=False)
+        db.session.commit()
+        return True
+
+    @staticmethod
+    def _finish_values(status, message):
+        now = datetime.now()
+        return {'status': status, 'message': message, 'finished_at': now,
+                'expires_at': now + timedelta(hours=current_app.config['JOB_RESULT_TTL_HOURS'])}
+
+    @staticmethod
+    def recover_stale():
+        """Kết thúc tác vụ Running mất nhịp tim và nộp lại tác vụ Pending bị bỏ rơi.
+
+        Mọi thay đổi đều là UPDATE có điều kiện, nên worker vừa gửi nhịp tim không bị
+        đánh dấu nhầm. File kết quả không bị xóa ở đây (worker có thể vẫn đang ghi);
+        purge_expired dọn sau khi hết hạn.
+        """
+        now = datetime.now()
+        cutoff = now - timedelta(minutes=current_app.config['JOB_HEARTBEAT_TIMEOUT_MINUTES'])
+        stale = db.or_(Job.updated_at.is_(None), Job.updated_at < cutoff)
+
+        for job in Job.query.filter(Job.status == 'Running', stale).all():
+            if job.cancel_requested:
+                values = JobService._finish_values('Cancelled', 'Đã hủy')
+            else:
+                values = JobService._finish_values('Failed', 'Bị gián đoạn (tiến trình xử lý đã dừng)')
+            Job.query.filter(Job.job_id == job.job_id, Job.status == 'Running', stale) \
+                .update(values, synchronize_session=False)
+
+        # Tác vụ Pending có thể nằm trong hàng đợi của một tiến trình đã dừng. Nộp lại vào
+        # tiến trình này; nếu tiến trình cũ vẫn còn sống thì chỉ một bên nhận được tác vụ.
+        orphaned = [job.job_id for job in Job.query.filter(Job.status == 'Pending', stale).all()]
+        if orphaned:
+            Job.query.filter(Job.job_id.in_(orphaned)).update({'updated_at': now}, synchronize_session=False)
+        db.session.commit()
+        for job_id in orphaned:
+            JobService._submit(job_id)
+
+    @staticmethod
+    def purge_expired():
+        # Xóa tác vụ đã kết thúc và hết hạn cùng file kết quả
+        JobService.recover_stale()
+        expired = Job.query.filter(Job.expires_at < datetime.now()).all()
+        for job in expired:
+            JobService.remove_results(job.job_id)
+            db.session.delete(job)
+        if expired:
+            db.session.commit()
+
+    @staticmethod
+    def _run(app, job_id):
+        with app.app_context():
+            try:
+                # Nhận tác vụ bằng một câu UPDATE để không có hai worker cùng chạy một tác vụ
+                now = datetime.now()
+                claimed = Job.query.filter_by(job_id=job_id, status='Pending').update(
+                    {'status': 'Running', 'started_at': now, 'updated_at': now, 'message': 'Đang xử lý'},
+                    synchronize_session=False)
+                db.session.commit()
+                if not claimed:
+                    return
+
+                job = db.session.get(Job, job_id)
+                ctx = JobContext(job)
+                handler = JOB_HANDLERS[job.job_type]['func']
+                params = json.loads(job.params or '{}')
+                try:
+                    message = handler(ctx, **params) or 'Hoàn thành'
+                    values = dict(JobService._finish_values('Done', message), progress=100,
+                                  result_file=ctx.result_file, download_name=ctx.download_name)
+                except JobCancelled as e:
+                    db.session.rollback()
+                    values = JobService._finish_values('Cancelled', str(e) or 'Đã hủy')
+                except Exception as e:
+                    db.session.rollback()
+                    values = JobService._finish_values('Failed', f'Lỗi: {str(e)}')
+
+                # Chỉ ghi kết quả nếu tác vụ vẫn Running (chưa bị coi là gián đoạn)
+                finished = Job.query.filter_by(job_id=job_id, status='Running').update(
+                    values, synchronize_session=False)
+                db.session.commit()
+                if not finished or values['status'] != 'Done':
+                    JobService.remove_results(job_id)
+            finally:
+                db.session.remove()
+
+
+# --- Các tác vụ nền ---
+
+def _month_starts_desc(start, end):
+    # Ngày đầu các tháng từ tháng chứa `end` lùi về tháng chứa `start`
+    months = []
+    current = end.replace(day=1)
+    while current >= start.replace(day=1):
+        months.append(current)
+        current = (current - timedelta(days=1)).replace(day=1)
+    return months
+
+
+@job_handler('export_attendance', 'Xuất báo cáo chấm công')
+def export_attendance(ctx, start=None, end=None):
+    start = date.fromisoformat(start) if start else None
+    end = date.fromisoformat(end) if end else None
+    ctx.update(0, 'Đang đọc dữ liệu')
+
+    # Khoảng ngày thực tế có dữ liệu (gộp bảng nóng và bảng lưu trữ)
+    bounds = [db.session.query(func.min(m.work_date), func.max(m.work_date)).one()
+              for m in (Attendance, AttendanceArchive)]
+    lows = [lo for lo, _ in bounds if lo]
+    highs = [hi for _, hi in bounds if hi]
+    start = max(start, min(lows)) if start and lows else (min(lows) if lows else start)
+    end = min(end, max(highs)) if end and highs else (max(highs) if highs else end)
+    months = _month_starts_desc(start, end) if start and end and start <= end else []
+
+    # Đọc từng tháng để báo tiến độ và cho phép hủy giữa chừng
+    data = []
+    for i, month_start in enumerate(months, 1):
+        month_end = month_start.replace(day=monthrange(month_start.year, month_start.month)[1])
+        rows = ArchiveService.history(start=max(start, month_start), end=min(end, month_end))
+        data.extend(ReportService.attendance_row(att) for att in rows)
+        ctx.update(i * 85 // len(months), f'Đã đọc {len(data)} bản ghi')
+
+    ctx.update(90, 'Đang ghi file Excel')
+    with ctx.keep_alive():
+        ReportService.write_excel(data, ctx.result_path('xlsx', 'bao_cao_cham_cong.xlsx'))
+    ctx.update(99)
+    return f'Đã xuất {len(data)} bản ghi'
+
+
+@job_handler('generate_roster', 'Xếp lịch cả tháng')
+def generate_roster(ctx, year, month):
+    # Xếp ca mặc định của nhân viên cho các ngày thứ 2 - thứ 6 chưa có lịch
+    days = [date(year, month, d) for d in range(1, monthrange(year, month)[1] + 1)]
+    workdays = [d for d in days if d.weekday() < 5]
+    users = User.query.filter(User.shift_id.isnot(None)).order_by(User.user_id.asc()).all()
+
+    # Gom lịch mới rồi ghi một lần ở cuối: hủy / lỗi giữa chừng thì không tạo lịch nào
+    new_schedules = []
+    for i, user in enumerate(users, 1):
+        existing = {s.work_date for s in EmployeeSchedule.query.filter(
+            EmployeeSchedule.user_id == user.user_id,
+            EmployeeSchedule.work_date >= days[0], EmployeeSchedule.work_date <= days[-1])}
+        new_schedules.extend(EmployeeSchedule(user_id=user.user_id, shift_id=user.shift_id, work_date=d)
+                             for d in workdays if d not in existing)
+        ctx.update(i * 95 // len(users))
+
+    db.session.add_all(new_schedules)
+    db.session.commit()
+    return f'Đã tạo {len(new_schedules)} lịch cho tháng {month:02d}/{year}'
+
+
+@job_handler('archive_attendance', 'Lưu trữ chấm công')
+def archive_attendance(ctx):
+    # Mỗi tháng được lưu trữ trong một transaction riêng, hủy giữa chừng vẫn giữ các tháng đã xong
+    ctx.update(5, 'Đang lưu trữ các tháng đã chốt')
+    done_months = []
+
+    def on_progress(done, total):
+        done_months.append(done)
+        ctx.update(5 + done * 90 // total, f'Đã lưu trữ {done}/{total} tháng')
+
+    try:
+        with ctx.keep_alive():
+            archived = ArchiveService.archive_closed_months(on_progress=on_progress)
+    except JobCancelled:
+        raise JobCancelled(f'Đã hủy (đã lưu trữ {len(done_months)} tháng)')
+    return f'Đã lưu trữ {len(archived)} tháng'
@@ -0,0 +1,27 @@
+# File: app/services/report_service.py
+import pandas as pd
+
+from app.models.user import User
+
+
+class ReportService:
+    @staticmethod
+    def attendance_row(att):
+        # Một dòng báo cáo chấm công (dùng cho tác vụ xuất Excel)
+        user = User.query.get(att.user_id)
+        return {
+            'Mã NV': att.user_id,
+            'Họ Tên': user.full_name if user else 'Unknown',
+            'Ngày': att.work_date,
+            'Vào': att.check_in_time.strftime('%H:%M') if att.check_in_time else '',
+            'Ra': att.check_out_time.strftime('%H:%M') if att.check_out_time else '',
+            'Trạng thái': att.status,
+            'Duyệt': att.approval_status
+        }
+
+    @staticmethod
+    def write_excel(rows, target):
+        # target có thể là đường dẫn file hoặc BytesIO
+        df = pd.DataFrame(rows)
+        with pd.ExcelWriter(target, engine='openpyxl') as writer:
+            df.to_excel(writer, index=False, sheet_name='ChamCong')
@@ -0,0 +1,37 @@
+// Theo dõi tiến độ tác vụ nền bằng cách hỏi trạng thái định kỳ
+document.addEventListener('DOMContentLoaded', function() {
+    const POLL_INTERVAL = 2000;
+
+    document.querySelectorAll('.job-row').forEach(row => {
+        const status = row.getAttribute('data-status');
+        if (status === 'Pending' || status === 'Running') {
+            pollJob(row);
+        }
+    });
+
+    function pollJob(row) {
+        fetch(row.getAttribute('data-status-url'))
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) return;
+
+                row.querySelector('.job-progress').style.width = `${data.progress}%`;
+                row.querySelector('.job-message').textContent = `${data.status} - ${data.message || ''}`;
+
+                if (data.download_url) {
+                    const link = row.querySelector('.job-download');
+                    link.href = data.download_url;
+                    link.classList.remove('d-none');
+                }
+
+                if (data.status === 'Pending' || data.status === 'Running') {
+                    setTimeout(() => pollJob(row), POLL_INTERVAL);
+                } else {
+                    // Tác vụ đã kết thúc: ẩn nút hủy
+                    const cancelForm = row.querySelector('.job-cancel');
+                    if (cancelForm) cancelForm.remove();
+                }
+            })
+            .catch(() => setTimeout(() => pollJob(row), POLL_INTERVAL * 2));
+    }
+});
@@ -13,4 +13,13 @@ class Config:
 
     _encoded_password = urllib.parse.quote_plus(DB_PASSWORD)
     SQLALCHEMY_DATABASE_URI = f'mysql+mysqlconnector://{DB_USER}:{_encoded_password}@{DB_HOST}/{DB_NAME}'
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Lưu trữ chấm công: số tháng đã chốt gần nhất vẫn giữ trong bảng attendance
+    ARCHIVE_KEEP_MONTHS = int(os.environ.get('ARCHIVE_KEEP_MONTHS', 3))
+
+    # Tác vụ nền: số worker chạy song song và thời gian giữ file kết quả
+    JOB_MAX_WORKERS = int(os.environ.get('JOB_MAX_WORKERS', 2))
+    JOB_RESULT_TTL_HOURS = int(os.environ.get('JOB_RESULT_TTL_HOURS', 24))
+    # Tác vụ không báo nhịp tim quá số phút này được coi là bị gián đoạn
+    JOB_HEARTBEAT_TIMEOUT_MINUTES = int(os.environ.get('JOB_HEARTBEAT_TIMEOUT_MINUTES', 10))
\ No newline at end of file